@@ -1,29 +1,53 @@
+import logging
+import math
 import os
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
 from typing import List, Optional
 from bson import ObjectId
+from cachetools import TTLCache
 
-from database import db, create_document, get_documents
-from schemas import Restaurant, MenuItem, Order, OrderItem, User, Product
+from database import db, create_document, create_documents, get_documents
+from schemas import OrderItem, User, Product
 
-app = FastAPI(title="Food Delivery API")
+logger = logging.getLogger(__name__)
+
+app = FastAPI(title="Food Delivery API", default_response_class=ORJSONResponse)
+
+# Comma-separated list of frontend origins, e.g. "https://app.example.com"
+cors_origins = [o.strip() for o in os.getenv("CORS_ORIGINS", "").split(",") if o.strip()]
+
+if not cors_origins:
+    logger.warning("CORS_ORIGINS is not set; allowing any origin without credentials. Set it to the frontend origin(s) to allow credentialed requests.")
 
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_origins=cors_origins or ["*"],
+    allow_credentials=bool(cors_origins),
+    allow_methods=["GET", "POST"],
+    allow_headers=["content-type", "authorization"],
+    max_age=86400,
 )
 
+@app.on_event("startup")
+async def ensure_indexes():
+    # Menu lookups filter on restaurant_id; index it so they don't scan the collection
+    if db is None:
+        return
+    try:
+        await db["menuitem"].create_index([("restaurant_id", 1)])
+    except Exception:
+        # Keep serving without the index, but make the collection-scan fallback visible
+        logger.exception("Could not create menuitem.restaurant_id index; menu lookups will scan the collection")
+
 @app.get("/")
-def read_root():
+async def read_root():
     return {"message": "Food Delivery API is running"}
 
 @app.get("/test")
-def test_database():
+async def test_database():
     response = {
         "backend": "✅ Running",
         "database": "❌ Not Available",
@@ -39,7 +63,7 @@ def test_database():
             response["database_name"] = db.name if hasattr(db, 'name') else "✅ Connected"
             response["connection_status"] = "Connected"
             try:
-                collections = db.list_collection_names()
+                collections = await db.list_collection_names()
                 response["collections"] = collections[:10]
                 response["database"] = "✅ Connected & Working"
             except Exception as e:
@@ -50,67 +74,80 @@ def test_database():
         response["database"] = f"❌ Error: {str(e)[:50]}"
     return response
 
-# Utility to convert ObjectId to string in results
+# Fields returned by the public list endpoints
 
-def _stringify_id(doc):
-    if isinstance(doc, dict) and doc.get("_id") is not None:
-        doc["_id"] = str(doc["_id"])
-    return doc
+RESTAURANT_PROJECTION = {"_id": 1, "name": 1, "cuisine": 1, "description": 1, "image": 1, "rating": 1, "delivery_time_min": 1}
+MENUITEM_PROJECTION = {"_id": 1, "restaurant_id": 1, "name": 1, "description": 1, "price": 1, "image": 1, "category": 1}
+
+# /restaurants changes rarely; serve it from memory for a short TTL
+_restaurants_cache = TTLCache(maxsize=1, ttl=30)
 
 # Seed sample data if collections are empty
 @app.post("/seed")
-def seed_data():
+async def seed_data():
     if db is None:
         raise HTTPException(status_code=500, detail="Database not configured")
 
-    collections = db.list_collection_names()
+    collections = set(await db.list_collection_names())
     created = {"restaurants": 0, "menuitem": 0}
+    restaurant_ids = []
 
-    if "restaurant" not in collections or db["restaurant"].count_documents({}) == 0:
+    if "restaurant" not in collections or await db["restaurant"].estimated_document_count() == 0:
         sample_restaurants = [
-            Restaurant(name="Pasta Palace", cuisine="Italian", description="Homemade pasta and sauces", image="https://images.unsplash.com/photo-1521389508051-d7ffb5dc8bbf", rating=4.6, delivery_time_min=30),
-            Restaurant(name="Sushi Express", cuisine="Japanese", description="Fresh nigiri and rolls", image="https://images.unsplash.com/photo-1544025162-d76694265947", rating=4.8, delivery_time_min=25),
-            Restaurant(name="Spice Route", cuisine="Indian", description="Curries, biryani and more", image="https://images.unsplash.com/photo-1604908554027-0f2f74a9cfc7", rating=4.5, delivery_time_min=35),
+            {"name": "Pasta Palace", "cuisine": "Italian", "description": "Homemade pasta and sauces", "image": "https://images.unsplash.com/photo-1521389508051-d7ffb5dc8bbf", "rating": 4.6, "delivery_time_min": 30},
+            {"name": "Sushi Express", "cuisine": "Japanese", "description": "Fresh nigiri and rolls", "image": "https://images.unsplash.com/photo-1544025162-d76694265947", "rating": 4.8, "delivery_time_min": 25},
+            {"name": "Spice Route", "cuisine": "Indian", "description": "Curries, biryani and more", "image": "https://images.unsplash.com/photo-1604908554027-0f2f74a9cfc7", "rating": 4.5, "delivery_time_min": 35},
         ]
-        for r in sample_restaurants:
-            create_document("restaurant", r)
-            created["restaurants"] += 1
-
-    if "menuitem" not in collections or db["menuitem"].count_documents({}) == 0:
-        # Fetch restaurants to link menu items
-        restaurants = list(db["restaurant"].find())
-        if restaurants:
-            first = restaurants[0]["_id"]
-            second = restaurants[1]["_id"] if len(restaurants) > 1 else first
-            third = restaurants[2]["_id"] if len(restaurants) > 2 else first
+        restaurant_ids = await create_documents("restaurant", sample_restaurants)
+        created["restaurants"] = len(restaurant_ids)
+
+    if "menuitem" not in collections or await db["menuitem"].estimated_document_count() == 0:
+        # Link menu items to the restaurants just inserted, or fetch existing ones
+        if not restaurant_ids:
+            restaurants = await db["restaurant"].find({}, {"_id": 1}).to_list(length=3)
+            restaurant_ids = [str(r["_id"]) for r in restaurants]
+        if restaurant_ids:
+            first = restaurant_ids[0]
+            second = restaurant_ids[1] if len(restaurant_ids) > 1 else first
+            third = restaurant_ids[2] if len(restaurant_ids) > 2 else first
             items = [
-                MenuItem(restaurant_id=str(first), name="Spaghetti Carbonara", description="Creamy sauce with pancetta", price=14.99, image="https://images.unsplash.com/photo-1603133872878-684f208fb86a", category="Mains"),
-                MenuItem(restaurant_id=str(first), name="Margherita Pizza", description="Classic tomatoes and mozzarella", price=12.5, image="https://images.unsplash.com/photo-1548365328-9f547fb09530", category="Mains"),
-                MenuItem(restaurant_id=str(second), name="Salmon Nigiri (6)", description="Fresh cut salmon over rice", price=11.99, image="https://images.unsplash.com/photo-1562158070-1a4f3f8f7c21", category="Sushi"),
-                MenuItem(restaurant_id=str(third), name="Chicken Tikka Masala", description="Charred chicken in spicy sauce", price=13.75, image="https://images.unsplash.com/photo-1604908177031-842fa9a316d2", category="Mains"),
+                {"restaurant_id": first, "name": "Spaghetti Carbonara", "description": "Creamy sauce with pancetta", "price": 14.99, "image": "https://images.unsplash.com/photo-1603133872878-684f208fb86a", "category": "Mains"},
+                {"restaurant_id": first, "name": "Margherita Pizza", "description": "Classic tomatoes and mozzarella", "price": 12.5, "image": "https://images.unsplash.com/photo-1548365328-9f547fb09530", "category": "Mains"},
+                {"restaurant_id": second, "name": "Salmon Nigiri (6)", "description": "Fresh cut salmon over rice", "price": 11.99, "image": "https://images.unsplash.com/photo-1562158070-1a4f3f8f7c21", "category": "Sushi"},
+                {"restaurant_id": third, "name": "Chicken Tikka Masala", "description": "Charred chicken in spicy sauce", "price": 13.75, "image": "https://images.unsplash.com/photo-1604908177031-842fa9a316d2", "category": "Mains"},
             ]
-            for i in items:
-                create_document("menuitem", i)
-                created["menuitem"] += 1
+            created["menuitem"] = len(await create_documents("menuitem", items))
 
+    _restaurants_cache.clear()
     return {"seeded": created}
 
 # Public endpoints
 
 @app.get("/restaurants")
-def list_restaurants():
-    docs = get_documents("restaurant")
-    return [_stringify_id(d) for d in docs]
+async def list_restaurants():
+    try:
+        return ORJSONResponse(_restaurants_cache["restaurants"])
+    except KeyError:
+        pass
+    out = []
+    for d in await get_documents("restaurant", projection=RESTAURANT_PROJECTION):
+        d["_id"] = str(d["_id"])
+        out.append(d)
+    _restaurants_cache["restaurants"] = out
+    return ORJSONResponse(out)
 
 @app.get("/restaurants/{restaurant_id}/menu")
-def list_menu(restaurant_id: str):
+async def list_menu(restaurant_id: str):
     try:
         # Ensure valid ObjectId string when filtering menu item references
         _ = ObjectId(restaurant_id)
     except Exception:
         pass
-    docs = get_documents("menuitem", {"restaurant_id": restaurant_id})
-    return [_stringify_id(d) for d in docs]
+    out = []
+    for d in await get_documents("menuitem", {"restaurant_id": restaurant_id}, projection=MENUITEM_PROJECTION):
+        d["_id"] = str(d["_id"])
+        out.append(d)
+    return ORJSONResponse(out)
 
 class CreateOrder(BaseModel):
     restaurant_id: str
@@ -119,41 +156,51 @@ class CreateOrder(BaseModel):
     phone: str
     items: List[OrderItem]
 
+def _order_total(items: List[OrderItem]) -> float:
+    """Sum price * quantity over the cart with compensated (exactly rounded) summation"""
+    return math.fsum([item.price * item.quantity for item in items])
+
 @app.post("/orders")
-def create_order(payload: CreateOrder):
+async def create_order(payload: CreateOrder):
     if db is None:
         raise HTTPException(status_code=500, detail="Database not configured")
 
     # Compute total server-side for trustworthiness
-    total = sum(item.price * item.quantity for item in payload.items)
-    order = Order(
-        restaurant_id=payload.restaurant_id,
-        customer_name=payload.customer_name,
-        address=payload.address,
-        phone=payload.phone,
-        items=payload.items,
-        total=round(total, 2),
-        status="pending",
-    )
-    oid = create_document("order", order)
-    return {"order_id": oid, "status": "pending", "total": order.total}
+    total = round(_order_total(payload.items), 2)
+    # payload is already validated, so store the Order fields as a plain dict
+    order = {
+        "restaurant_id": payload.restaurant_id,
+        "customer_name": payload.customer_name,
+        "address": payload.address,
+        "phone": payload.phone,
+        "items": [item.model_dump() for item in payload.items],
+        "total": total,
+        "status": "pending",
+    }
+    oid = await create_document("order", order)
+    return {"order_id": oid, "status": "pending", "total": total}
+
+# Collection names so the viewer can introspect installed schemas
+_SCHEMA = {
+    "collections": [
+        "user",
+        "product",
+        "restaurant",
+        "menuitem",
+        "order",
+    ]
+}
 
 # Schema endpoint for database viewer
 @app.get("/schema")
-def get_schema():
-    from schemas import User, Product, Restaurant, MenuItem, Order, OrderItem
-    # Return class names so the viewer can introspect installed schemas
-    return {
-        "collections": [
-            "user",
-            "product",
-            "restaurant",
-            "menuitem",
-            "order",
-        ]
-    }
+async def get_schema():
+    return _SCHEMA
 
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("PORT", 8000))
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    # Scale out explicitly; every worker opens its own Mongo pool and restaurants cache
+    workers = int(os.getenv("WEB_CONCURRENCY", 1))
+    # Multiple workers need an import string; a single worker reuses this module's app.
+    # "auto" picks uvloop/httptools when installed (uvicorn[standard]) and falls back otherwise
+    uvicorn.run(app if workers == 1 else "main:app", host="0.0.0.0", port=port, loop="auto", http="auto", workers=workers)